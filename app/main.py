@@ -1,6 +1,8 @@
 from fastapi import FastAPI, File, UploadFile, Form, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, ORJSONResponse
+from contextlib import asynccontextmanager
+import asyncio
 import os
 from dotenv import load_dotenv
 
@@ -8,11 +10,28 @@ from app.services.file_processor import FileProcessor
 from app.services.cv_analyzer import CVAnalyzer
 from app.models import AnalysisResult
 from app.services.linkedin_fetcher import LinkedInFetcher
+from app.services.analysis_queue import BatchingAnalyzerQueue
 
 # Load environment variables
 load_dotenv()
 
-app = FastAPI(title="CV Matcher API", version="1.1.0")
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Start the batching worker that coalesces concurrent analysis requests
+    await linkedin_fetcher.startup()
+    await analysis_queue.start()
+    yield
+    await analysis_queue.stop()
+    await cv_analyzer.aclose()
+    await linkedin_fetcher.aclose()
+    file_processor.shutdown()
+
+app = FastAPI(
+    title="CV Matcher API",
+    version="1.1.0",
+    lifespan=lifespan,
+    default_response_class=ORJSONResponse,
+)
 
 # CORS middleware for frontend integration
 app.add_middleware(
@@ -27,6 +46,10 @@ app.add_middleware(
 file_processor = FileProcessor()
 cv_analyzer = CVAnalyzer()
 linkedin_fetcher = LinkedInFetcher()
+analysis_queue = BatchingAnalyzerQueue(cv_analyzer)
+
+async def _no_text() -> str:
+    return ""
 
 @app.get("/")
 async def root():
@@ -42,30 +65,36 @@ async def analyze_cv(
     Analyze CV and/or LinkedIn profile against job description and return matching results
     """
     try:
-        if (cv_file is None or not getattr(cv_file, "filename", "")) and (not linkedin_url or not linkedin_url.strip()):
+        has_cv_file = bool(cv_file and getattr(cv_file, "filename", ""))
+        has_linkedin_url = bool(linkedin_url and linkedin_url.strip())
+
+        if not has_cv_file and not has_linkedin_url:
             raise HTTPException(
                 status_code=400,
                 detail="Please upload a CV or provide a LinkedIn URL."
             )
 
-        sources_text: list[str] = []
+        if has_cv_file and not cv_file.filename.lower().endswith((".pdf", ".doc", ".docx")):
+            raise HTTPException(
+                status_code=400,
+                detail="Only PDF, DOC, and DOCX files are supported"
+            )
 
-        # Extract text from uploaded CV if provided
-        if cv_file and getattr(cv_file, "filename", ""):
-            if not cv_file.filename.lower().endswith((".pdf", ".doc", ".docx")):
-                raise HTTPException(
-                    status_code=400,
-                    detail="Only PDF, DOC, and DOCX files are supported"
-                )
-            cv_text = await file_processor.extract_text(cv_file)
-            if cv_text and cv_text.strip():
-                sources_text.append(f"CV Document:\n{cv_text}")
-
-        # Fetch LinkedIn profile text if URL provided
-        if linkedin_url and linkedin_url.strip():
-            li_text = await linkedin_fetcher.fetch_profile_text(linkedin_url.strip())
-            if li_text and li_text.strip():
-                sources_text.append(f"LinkedIn Profile:\n{li_text}")
+        # Extract text from the uploaded CV and fetch the LinkedIn profile concurrently
+        cv_text, li_text = await asyncio.gather(
+            file_processor.extract_text(cv_file) if has_cv_file else _no_text(),
+            linkedin_fetcher.fetch_profile_text(linkedin_url.strip()) if has_linkedin_url else _no_text(),
+            return_exceptions=True,
+        )
+        for result in (cv_text, li_text):
+            if isinstance(result, BaseException):
+                raise result
+
+        sources_text: list[str] = []
+        if cv_text and cv_text.strip():
+            sources_text.append(f"CV Document:\n{cv_text}")
+        if li_text and li_text.strip():
+            sources_text.append(f"LinkedIn Profile:\n{li_text}")
 
         if not sources_text:
             raise HTTPException(
@@ -76,7 +105,7 @@ async def analyze_cv(
         combined_text = "\n\n---\n\n".join(sources_text)
 
         # Analyze combined content against job description
-        analysis_result = await cv_analyzer.analyze(combined_text, job_description)
+        analysis_result = await analysis_queue.analyze(combined_text, job_description)
 
         return analysis_result
 
@@ -1,4 +1,4 @@
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 from typing import List
 
 class Strength(BaseModel):
@@ -11,10 +11,11 @@ class Weakness(BaseModel):
     suggestion: str
 
 class AnalysisResult(BaseModel):
-    match_percentage: int
+    match_percentage: int = Field(ge=0, le=100)
     strengths: List[Strength]
     weaknesses: List[Weakness]
     summary: str
+    warnings: List[str] = []
     
 class CVData(BaseModel):
     skills: List[str]
@@ -0,0 +1,164 @@
+import asyncio
+from typing import List, Optional, Set, Tuple
+from app.models import AnalysisResult
+from app.services.cv_analyzer import (
+    CHARS_PER_TOKEN,
+    CV_TOKEN_BUDGET,
+    JOB_DESCRIPTION_TOKEN_BUDGET,
+    BatchResponseError,
+    CVAnalyzer,
+)
+
+# Batching limits: flush after MAX_BATCH items, BATCH_WINDOW_MS of waiting,
+# or once the estimated prompt size would exceed MAX_BATCH_TOKENS
+MAX_BATCH = 8
+BATCH_WINDOW_MS = 100
+MAX_BATCH_TOKENS = 12000
+
+QueueItem = Tuple[str, str, asyncio.Future]
+
+
+class BatchingAnalyzerQueue:
+    """Coalesces concurrent analysis requests into batched GitHub Models calls.
+
+    Requests arriving within a short window are grouped and sent to the model as one
+    prompt asking for N independent analyses; each caller awaits its own result. When
+    the worker is not running, requests go straight to the analyzer.
+    """
+
+    def __init__(
+        self,
+        analyzer: CVAnalyzer,
+        max_batch: int = MAX_BATCH,
+        batch_window_ms: int = BATCH_WINDOW_MS,
+        max_batch_tokens: int = MAX_BATCH_TOKENS,
+    ):
+        self.analyzer = analyzer
+        self.max_batch = max_batch
+        self.batch_window_seconds = batch_window_ms / 1000
+        self.max_batch_tokens = max_batch_tokens
+        self._queue: Optional[asyncio.Queue] = None
+        self._worker: Optional[asyncio.Task] = None
+        # Item held back for the next batch because it did not fit the token budget
+        self._pending: Optional[QueueItem] = None
+        self._batch_tasks: Set[asyncio.Task] = set()
+
+    async def start(self) -> None:
+        if self._worker is None:
+            self._queue = asyncio.Queue()
+            self._worker = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._worker is None:
+            return
+
+        self._worker.cancel()
+        try:
+            await self._worker
+        except asyncio.CancelledError:
+            pass
+        self._worker = None
+
+        if self._batch_tasks:
+            await asyncio.gather(*self._batch_tasks, return_exceptions=True)
+
+        # Fail anything still waiting so callers are not left hanging
+        leftovers: List[QueueItem] = [self._pending] if self._pending else []
+        self._pending = None
+        while not self._queue.empty():
+            leftovers.append(self._queue.get_nowait())
+        for _, _, future in leftovers:
+            if not future.done():
+                future.set_exception(Exception("Analysis queue is shutting down"))
+
+    async def analyze(self, cv_text: str, job_description: str) -> AnalysisResult:
+        """
+        Queue an analysis and wait for its result from the next batch
+        """
+        if self._worker is None:
+            return await self.analyzer.analyze(cv_text, job_description)
+
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put((cv_text, job_description, future))
+        return await future
+
+    async def _run(self) -> None:
+        while True:
+            batch = await self._collect_batch()
+            # Process in the background so the next batch can be collected meanwhile
+            task = asyncio.create_task(self._process_batch(batch))
+            self._batch_tasks.add(task)
+            task.add_done_callback(self._batch_tasks.discard)
+
+    async def _collect_batch(self) -> List[QueueItem]:
+        loop = asyncio.get_running_loop()
+        first = self._pending or await self._queue.get()
+        self._pending = None
+
+        batch = [first]
+        batch_tokens = self._estimate_tokens(first)
+        deadline = loop.time() + self.batch_window_seconds
+
+        while len(batch) < self.max_batch:
+            timeout = deadline - loop.time()
+            if timeout <= 0:
+                break
+            try:
+                item = await asyncio.wait_for(self._queue.get(), timeout)
+            except asyncio.TimeoutError:
+                break
+
+            item_tokens = self._estimate_tokens(item)
+            if batch_tokens + item_tokens > self.max_batch_tokens:
+                self._pending = item
+                break
+            batch.append(item)
+            batch_tokens += item_tokens
+
+        return batch
+
+    async def _process_batch(self, batch: List[QueueItem]) -> None:
+        # Skip callers that went away (e.g. client disconnected) while queued
+        live = [item for item in batch if not item[2].done()]
+        if not live:
+            return
+        if len(live) == 1:
+            await self._process_single(live[0])
+            return
+
+        try:
+            results = await self.analyzer.analyze_batch([(cv_text, jd) for cv_text, jd, _ in live])
+        except BatchResponseError:
+            # A malformed batch response should not fail every caller: analyze individually
+            await asyncio.gather(*(self._process_single(item) for item in live))
+            return
+        except Exception as e:
+            # The model call itself failed; retrying per item would only add load
+            results = [e] * len(live)
+
+        for (_, _, future), result in zip(live, results):
+            if future.done():
+                continue
+            if isinstance(result, Exception):
+                future.set_exception(result)
+            else:
+                future.set_result(result)
+
+    async def _process_single(self, item: QueueItem) -> None:
+        cv_text, job_description, future = item
+        try:
+            result = await self.analyzer.analyze(cv_text, job_description)
+        except Exception as e:
+            if not future.done():
+                future.set_exception(e)
+            return
+        if not future.done():
+            future.set_result(result)
+
+    def _estimate_tokens(self, item: QueueItem) -> int:
+        cv_text, job_description, _ = item
+        # Inputs are truncated to their budgets before they reach the prompt
+        return (
+            min(len(cv_text) // CHARS_PER_TOKEN, CV_TOKEN_BUDGET)
+            + min(len(job_description) // CHARS_PER_TOKEN, JOB_DESCRIPTION_TOKEN_BUDGET)
+        )
@@ -1,76 +1,190 @@
+import asyncio
 import io
-import re
-from typing import Optional
+import multiprocessing
+import os
+import zipfile
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import BinaryIO, Optional
 from fastapi import UploadFile
-import PyPDF2
+import pypdfium2 as pdfium
 from docx import Document
+from lxml import etree
+
+# Punctuation kept by _clean_text in addition to word characters and whitespace
+_KEEP_PUNCTUATION = frozenset("-.,;:()[]/@#%&+_")
+
+# Only Basic Multilingual Plane code points are cached, bounding the table to 65,536 entries
+_CACHED_CODEPOINTS = 0x10000
+
+class _DeletionTable(dict):
+    """str.translate table that drops special characters, filled in lazily per code point"""
+    
+    def __missing__(self, codepoint: int) -> Optional[int]:
+        char = chr(codepoint)
+        keep = char.isalnum() or char.isspace() or char in _KEEP_PUNCTUATION
+        value = codepoint if keep else None
+        if codepoint < _CACHED_CODEPOINTS:
+            self[codepoint] = value
+        return value
+
+_DEL_TABLE = _DeletionTable()
+
+# WordprocessingML elements read when extracting DOCX text directly from the XML
+_W_NS = "{http://schemas.openxmlformats.org/wordprocessingml/2006/main}"
+_W_P = f"{_W_NS}p"
+_W_T = f"{_W_NS}t"
+_W_TAB = f"{_W_NS}tab"
+_W_BR = f"{_W_NS}br"
+_W_CR = f"{_W_NS}cr"
+_W_BREAKS = (_W_TAB, _W_BR, _W_CR)
+# Alternate renderings (e.g. legacy VML copies of text boxes) that duplicate the mc:Choice content
+_MC_FALLBACK = "{http://schemas.openxmlformats.org/markup-compatibility/2006}Fallback"
+# Uploaded documents are untrusted: never expand entities or touch the network
+_XML_PARSER = etree.XMLParser(resolve_entities=False, no_network=True)
+
+def _collect_paragraphs(element, runs: list[str], lines: list[str]) -> None:
+    """Walk a WordprocessingML tree, giving each w:p (including text box paragraphs) its own line"""
+    for child in element:
+        if child.tag == _MC_FALLBACK:
+            continue
+        if child.tag == _W_P:
+            paragraph_runs: list[str] = []
+            _collect_paragraphs(child, paragraph_runs, lines)
+            lines.append("".join(paragraph_runs))
+        elif child.tag == _W_T:
+            runs.append(child.text or "")
+        elif child.tag in _W_BREAKS:
+            runs.append(" ")
+        else:
+            _collect_paragraphs(child, runs, lines)
+
+def _page_text(page) -> str:
+    textpage = page.get_textpage()
+    try:
+        return textpage.get_text_bounded()
+    finally:
+        textpage.close()
+        page.close()
 
 class FileProcessor:
     """Service for extracting text from uploaded CV files"""
     
+    def __init__(self):
+        # Worker processes for CPU-bound document parsing, created on first use
+        self._pool: Optional[ProcessPoolExecutor] = None
+    
+    def shutdown(self) -> None:
+        """Stop the worker processes used for document parsing"""
+        if self._pool is not None:
+            self._pool.shutdown(cancel_futures=True)
+            self._pool = None
+    
+    def _get_pool(self) -> ProcessPoolExecutor:
+        if self._pool is None:
+            # Spawned rather than forked so workers never inherit the server's threads
+            self._pool = ProcessPoolExecutor(
+                max_workers=max(2, (os.cpu_count() or 1) - 1),
+                mp_context=multiprocessing.get_context("spawn"),
+            )
+        return self._pool
+    
+    async def _run_in_pool(self, content: bytes, file_extension: str) -> str:
+        """Parse in a worker process, replacing the pool if a worker died"""
+        loop = asyncio.get_running_loop()
+        pool = self._get_pool()
+        try:
+            return await loop.run_in_executor(pool, _extract_text_sync, content, file_extension)
+        except BrokenProcessPool:
+            if self._pool is pool:
+                # First to see the breakage: this document may be what crashed the worker,
+                # so replace the pool for later requests but do not resubmit it
+                pool.shutdown(wait=False, cancel_futures=True)
+                self._pool = None
+                raise
+        # Another request already replaced the pool, so this parse was collateral; retry once
+        return await loop.run_in_executor(self._get_pool(), _extract_text_sync, content, file_extension)
+    
     async def extract_text(self, file: UploadFile) -> str:
         """
         Extract text from uploaded file (PDF, DOC, DOCX)
         """
         try:
             file_extension = file.filename.lower().split('.')[-1]
-            content = await file.read()
-            
-            if file_extension == 'pdf':
-                return self._extract_from_pdf(content)
-            elif file_extension in ['doc', 'docx']:
-                return self._extract_from_word(content)
-            else:
+            if file_extension not in ['pdf', 'doc', 'docx']:
                 raise ValueError(f"Unsupported file type: {file_extension}")
+            
+            # Worker processes need the document as bytes
+            content = await file.read()
+            return await self._run_in_pool(content, file_extension)
                 
         except Exception as e:
             raise Exception(f"Error processing file: {str(e)}")
     
-    def _extract_from_pdf(self, content: bytes) -> str:
-        """Extract text from PDF using PyPDF2 only"""
+    def _extract_from_pdf(self, source: BinaryIO) -> str:
+        """Extract text from PDF using PDFium"""
         try:
-            text = ""
-            pdf_reader = PyPDF2.PdfReader(io.BytesIO(content))
-            for page in pdf_reader.pages:
-                page_text = page.extract_text()
-                if page_text:
-                    text += page_text + "\n"
+            pdf = pdfium.PdfDocument(source)
+            try:
+                page_texts = [_page_text(pdf[index]) for index in range(len(pdf))]
+            finally:
+                pdf.close()
+            
+            text = "\n".join(page_text for page_text in page_texts if page_text)
             return self._clean_text(text)
         except Exception as e:
             raise Exception(f"Failed to extract PDF text: {str(e)}")
     
-    def _extract_from_word(self, content: bytes) -> str:
-        """Extract text from Word document"""
+    def _extract_from_word(self, source: BinaryIO) -> str:
+        """Extract text from Word document by reading its main XML part directly"""
         try:
-            doc = Document(io.BytesIO(content))
-            text = ""
+            try:
+                with zipfile.ZipFile(source) as archive:
+                    document_xml = archive.read("word/document.xml")
+            except KeyError:
+                # No standard main document part, let python-docx resolve the package
+                source.seek(0)
+                return self._extract_with_python_docx(source)
             
-            # Extract text from paragraphs
-            for paragraph in doc.paragraphs:
-                text += paragraph.text + "\n"
+            root = etree.fromstring(document_xml, _XML_PARSER)
+            parts: list[str] = []
             
-            # Extract text from tables
-            for table in doc.tables:
-                for row in table.rows:
-                    for cell in row.cells:
-                        text += cell.text + " "
-                    text += "\n"
+            # One line per paragraph, including the paragraphs inside table cells and text boxes
+            _collect_paragraphs(root, [], parts)
             
-            return self._clean_text(text)
+            return self._clean_text("\n".join(parts))
             
         except Exception as e:
             raise Exception(f"Failed to extract Word document text: {str(e)}")
     
+    def _extract_with_python_docx(self, source: BinaryIO) -> str:
+        """Extract text from Word document through the python-docx object model"""
+        doc = Document(source)
+        parts: list[str] = []
+        
+        # Extract text from paragraphs
+        for paragraph in doc.paragraphs:
+            parts.append(paragraph.text)
+        
+        # Extract text from tables
+        for table in doc.tables:
+            for row in table.rows:
+                parts.append(" ".join(cell.text for cell in row.cells))
+        
+        return self._clean_text("\n".join(parts))
+    
     def _clean_text(self, text: str) -> str:
         """Clean and normalize extracted text"""
         if not text:
             return ""
         
-        # Remove excessive whitespace and newlines
-        text = re.sub(r'\n+', '\n', text)
-        text = re.sub(r'\s+', ' ', text)
-        
-        # Remove special characters that might interfere with processing
-        text = re.sub(r'[^\w\s\-.,;:()\[\]/@#%&+]', '', text)
-        
-        return text.strip() 
\ No newline at end of file
+        # Remove special characters that might interfere with processing, then
+        # collapse whitespace and newlines in the same pass over the text
+        return " ".join(text.translate(_DEL_TABLE).split())
+
+def _extract_text_sync(content: bytes, file_extension: str) -> str:
+    """Extract text from an uploaded document's bytes (runs in a worker process)"""
+    processor = FileProcessor()
+    if file_extension == 'pdf':
+        return processor._extract_from_pdf(io.BytesIO(content))
+    return processor._extract_from_word(io.BytesIO(content))
\ No newline at end of file
@@ -1,8 +1,33 @@
 import re
+import heapq
 import asyncio
 from typing import Optional
-import requests
-from bs4 import BeautifulSoup
+import ahocorasick
+import httpx
+from selectolax.lexbor import LexborHTMLParser
+
+_RE_WS = re.compile(r"\s+")
+_RE_UI = re.compile(r"See more|Show more|See less|Show less", re.IGNORECASE)
+# Markers of login walls, captchas and JS-only interstitials
+_BLOCK_RE = re.compile(r"signin|login|captcha|enable javascript", re.IGNORECASE)
+# Cap on how much of a page is scanned and parsed
+_MAX_HTML_CHARS = 4_000_000
+
+# Words that suggest a page block holds profile content
+PROFILE_KEYWORDS = [
+    "experience",
+    "education",
+    "skills",
+    "certification",
+    "projects",
+    "about",
+    "summary",
+    "activity",
+    "languages",
+    "honors",
+    "awards",
+    "volunteer",
+]
 
 
 class LinkedInFetcher:
@@ -23,77 +48,89 @@ class LinkedInFetcher:
             "Accept-Language": "en-US,en;q=0.9",
         }
 
-    async def fetch_profile_text(self, url: str) -> str:
-        return await asyncio.to_thread(self._fetch_profile_text_sync, url)
+        self._client: Optional[httpx.AsyncClient] = None
+
+        # Single automaton to find every profile keyword in one scan of a block's text;
+        # each keyword maps to its own bit so matches combine into a bitmask
+        self._keyword_automaton = ahocorasick.Automaton()
+        for index, keyword in enumerate(PROFILE_KEYWORDS):
+            self._keyword_automaton.add_word(keyword, 1 << index)
+        self._keyword_automaton.make_automaton()
+
+    async def startup(self) -> None:
+        """Create the shared HTTP client used for all profile fetches"""
+        if self._client is None:
+            self._client = httpx.AsyncClient(
+                http2=True,
+                headers=self._headers,
+                timeout=self.request_timeout_seconds,
+                follow_redirects=True,
+                limits=httpx.Limits(max_keepalive_connections=50, max_connections=100),
+            )
+
+    async def aclose(self) -> None:
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
 
-    def _fetch_profile_text_sync(self, url: str) -> str:
+    async def fetch_profile_text(self, url: str) -> str:
         try:
             if not url or "linkedin.com" not in url:
                 return ""
 
-            response = requests.get(url, headers=self._headers, timeout=self.request_timeout_seconds)
+            await self.startup()
+            response = await self._client.get(url)
             if response.status_code != 200:
                 return ""
 
-            html = response.text
+            # HTML parsing is CPU-bound, keep it off the event loop
+            return await asyncio.to_thread(self._extract_profile_text, response.text)
+        except Exception:
+            return ""
+
+    def _extract_profile_text(self, html: str) -> str:
+        try:
+            if len(html) > _MAX_HTML_CHARS:
+                html = html[:_MAX_HTML_CHARS]
+
             # Quick block/redirect detection
-            if any(block in html.lower() for block in ["signin", "login", "captcha", "enable javascript"]):
+            if _BLOCK_RE.search(html):
                 # Likely blocked or requires auth/JS
                 return ""
 
-            soup = BeautifulSoup(html, "html.parser")
+            tree = LexborHTMLParser(html)
 
             extracted_sections = []
 
             # Title and meta description
-            page_title = (soup.title.string or "").strip() if soup.title else ""
+            title_node = tree.css_first("title")
+            page_title = title_node.text().strip() if title_node else ""
             if page_title:
                 extracted_sections.append(f"Title: {page_title}")
 
-            og_desc = soup.find("meta", attrs={"property": "og:description"})
-            if og_desc and og_desc.get("content"):
-                extracted_sections.append(f"About: {og_desc['content'].strip()}")
+            og_desc = tree.css_first('meta[property="og:description"]')
+            og_content = og_desc.attributes.get("content") if og_desc else None
+            if og_content:
+                extracted_sections.append(f"About: {og_content.strip()}")
 
             # Visible text strategy: pick text from sections that resemble profile blocks
             # This is heuristic and may evolve.
-            candidates = []
-            for selector in [
-                "section",
-                "main",
-                "div",
-            ]:
-                candidates.extend(soup.select(selector))
-
-            def score_section(node) -> int:
-                text = node.get_text(separator=" ", strip=True)
-                score = 0
-                keywords = [
-                    "experience",
-                    "education",
-                    "skills",
-                    "certification",
-                    "projects",
-                    "about",
-                    "summary",
-                    "activity",
-                    "languages",
-                    "honors",
-                    "awards",
-                    "volunteer",
-                ]
-                lower = text.lower()
-                for kw in keywords:
-                    if kw in lower:
-                        score += 1
-                score += min(len(text) // 200, 5)
-                return score
-
-            # Take top N sections by heuristic score
-            candidates = sorted(candidates, key=score_section, reverse=True)[:12]
+            # One traversal for all block types, deduplicated by the underlying node
+            candidates = list({node.mem_id: node for node in tree.css("section, main, div")}.values())
+            # Text extraction is the expensive part, so do it once per node
+            texts = {node.mem_id: node.text(separator=" ", strip=True) for node in candidates}
+
+            def score_section(text: str) -> int:
+                matched = 0
+                for _, bit in self._keyword_automaton.iter(text.lower()):
+                    matched |= bit
+                return matched.bit_count() + min(len(text) // 200, 5)
+
+            # Take top N sections by heuristic score (partial sort, same order as a full sort)
+            candidates = heapq.nlargest(12, candidates, key=lambda node: score_section(texts[node.mem_id]))
 
             for node in candidates:
-                text = node.get_text(separator=" ", strip=True)
-                text = self._clean_text(text)
+                text = self._clean_text(texts[node.mem_id])
                 if len(text) > 200:
                     extracted_sections.append(text)
 
@@ -104,9 +141,9 @@ class LinkedInFetcher:
             return ""
 
     def _clean_text(self, text: str) -> str:
-        text = re.sub(r"\s+", " ", text or "").strip()
+        text = _RE_WS.sub(" ", text or "").strip()
         # Remove repeated UI artifacts
-        text = re.sub(r"See more|Show more|See less|Show less", "", text, flags=re.IGNORECASE)
+        text = _RE_UI.sub("", text)
         return text.strip()
 
     def _dedupe_preserve_order(self, items: list[str]) -> list[str]: